@@ -0,0 +1,130 @@
+"""Benchmark the setup time of UI modules generated with and without the optimize_ui option
+
+A large dialog with many tabs full of labeled fields is generated, compiled twice with pyqt5ac (once plainly and once
+with optimize_ui enabled) and then the time it takes to import each module and call setupUi is compared.
+
+The generated dialog is close to a best case for optimize_ui: every line edit is explicitly marked as enabled and the
+same strings are repeated in every tab. Even so, setupUi only gets a few percent faster since its time is dominated by
+creating the Qt widgets, most of the gain is in importing the module. Measure with your own .ui files before relying on
+the option.
+
+Usage:
+    python benchmarks/benchmark_optimize_ui.py [--tabs N] [--rows N] [--repeat N]
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import timeit
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyqt5ac  # noqa: E402
+from PyQt5 import QtWidgets  # noqa: E402
+
+
+def _writeUiFile(filename, tabs, rows):
+    tabWidgets = []
+
+    for tab in range(tabs):
+        items = []
+
+        for row in range(rows):
+            items.append("""
+       <item row="{row}" column="0">
+        <widget class="QLabel" name="label_{tab}_{row}">
+         <property name="text"><string>Field {row}</string></property>
+         <property name="toolTip"><string>Tooltip of field {row}</string></property>
+        </widget>
+       </item>
+       <item row="{row}" column="1">
+        <widget class="QLineEdit" name="lineEdit_{tab}_{row}">
+         <property name="enabled"><bool>true</bool></property>
+         <property name="placeholderText"><string>Enter value</string></property>
+        </widget>
+       </item>""".format(tab=tab, row=row))
+
+        tabWidgets.append("""
+     <widget class="QWidget" name="tab_{tab}">
+      <attribute name="title"><string>Tab {tab}</string></attribute>
+      <layout class="QFormLayout" name="formLayout_{tab}">{items}
+      </layout>
+     </widget>""".format(tab=tab, items=''.join(items)))
+
+    with open(filename, 'w') as fh:
+        fh.write("""<?xml version="1.0" encoding="UTF-8"?>
+<ui version="4.0">
+ <class>Dialog</class>
+ <widget class="QDialog" name="Dialog">
+  <property name="windowTitle"><string>Dialog</string></property>
+  <layout class="QVBoxLayout" name="verticalLayout">
+   <item>
+    <widget class="QTabWidget" name="tabWidget">{tabs}
+    </widget>
+   </item>
+  </layout>
+ </widget>
+ <resources/>
+ <connections/>
+</ui>
+""".format(tabs=''.join(tabWidgets)))
+
+
+def _loadModule(name, filename):
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _setupUi(module):
+    dialog = QtWidgets.QDialog()
+    module.Ui_Dialog().setupUi(dialog)
+
+
+def _benchmark(modules, repeat):
+    importTimes = {name: [] for name in modules}
+    setupTimes = {name: [] for name in modules}
+
+    # Alternate between the modules on every repetition so that neither one benefits from running last
+    for _ in range(repeat):
+        for name, filename in modules.items():
+            importTimes[name].append(timeit.timeit(lambda: _loadModule(name, filename), number=1))
+            module = _loadModule(name, filename)
+            setupTimes[name].append(timeit.timeit(lambda: _setupUi(module), number=1))
+
+    return {name: (min(importTimes[name]), min(setupTimes[name])) for name in modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tabs', type=int, default=20, help='Number of tabs in the dialog')
+    parser.add_argument('--rows', type=int, default=50, help='Number of labeled fields in each tab')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of times each measurement is repeated')
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)  # noqa: F841
+
+    with tempfile.TemporaryDirectory() as dir:
+        _writeUiFile(os.path.join(dir, 'dialog.ui'), args.tabs, args.rows)
+
+        pyqt5ac.main(ioPaths=[[os.path.join(dir, '*.ui'), os.path.join(dir, 'plain', '%%FILENAME%%_ui.py')]])
+        pyqt5ac.main(ioPaths=[[os.path.join(dir, '*.ui'), os.path.join(dir, 'optimized', '%%FILENAME%%_ui.py')]],
+                     optimizeUi=True)
+
+        results = _benchmark({
+            'plain': os.path.join(dir, 'plain', 'dialog_ui.py'),
+            'optimized': os.path.join(dir, 'optimized', 'dialog_ui.py'),
+        }, args.repeat)
+
+    print('%i tabs x %i rows, best of %i' % (args.tabs, args.rows, args.repeat))
+    print('%-10s %12s %12s' % ('', 'import (ms)', 'setupUi (ms)'))
+    for name, (importTime, setupTime) in results.items():
+        print('%-10s %12.2f %12.2f' % (name, importTime * 1000, setupTime * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,62 @@
+import collections
+import concurrent.futures
+import contextlib
 import glob
+import hashlib
 import json
+import math
 import os
+import re
+import runpy
 import shlex
 import subprocess
 import sys
+import tempfile
+import time
+import traceback
 
 import click
 import yaml
+from PyQt5.QtCore import PYQT_VERSION_STR
+
+try:
+    import fcntl
+except ImportError:
+    # Windows does not have fcntl, msvcrt provides the equivalent byte-range locking
+    fcntl = None
+    import msvcrt
 
 __version__ = '1.2.1'
 
+# Matches a call to QCoreApplication.translate in a pyuic5 generated module where all arguments are string literals
+# pyuic5 always emits double quoted strings, the context and source text are followed by an optional disambiguation
+_translateCallRegex = re.compile(r'_translate\(("(?:[^"\\]|\\.)*"(?:, "(?:[^"\\]|\\.)*"){1,2})\)')
+
+# Matches setEnabled(True) calls on widgets created by setupUi
+# These only do nothing for stock Qt widgets, which are always enabled after construction, see _stockWidgetRegex
+_redundantSetterRegex = re.compile(r'^[ \t]*self\.(\w+)\.setEnabled\(True\)\n', re.M)
+
+# Matches widgets created by setupUi directly from a stock Qt class
+# Promoted custom widgets are created from their own class, whose constructor may disable the widget
+_stockWidgetRegex = re.compile(r'^[ \t]*self\.(\w+) = Qt(?:Widgets|Gui)\.Q\w+\(', re.M)
+
+# Comment on the last line of a generated file recording the fingerprint it was generated with, see _buildFingerprint
+_fingerprintPrefix = '# pyqt5ac fingerprint: '
+
+# Number of bytes read from the end of a generated file to find its fingerprint
+_fingerprintMaxSize = 65536
+
+# Command line argument that runs this file as a batch worker, see _batchWorker
+_batchWorkerArgument = '--batch-worker'
+
+# Minimum number of files given to each batch worker
+# Starting an interpreter and importing PyQt5 is not worth it for fewer files, so small jobs use a single worker
+_minBatchSize = 8
+
+# Information about a single file to compile, collected by main before anything is compiled
+_Job = collections.namedtuple('_Job', ['filename', 'module', 'command', 'options', 'sourceFilename', 'destFilename',
+                                       'isQRCFile', 'postProcess', 'fingerprint', 'destModTime'])
+
 
 # Takes information about command and creates an argument list from it
 # In addition to an argument list, a 'cleaner' string is returned to be shown to the user
@@ -34,10 +81,45 @@ def _buildCommand(module, command, options, sourceFilename, destFilename):
     return argList, commandString
 
 
-def _isOutdated(src, dst, isQRCFile):
+# Create a fingerprint of everything besides the source file that affects the generated file
+# This includes the compiler module and its options from the argument list created by _buildCommand (excluding the
+# executable and the input/output filenames), the PyQt5 and pyqt5ac versions and the post-processing step, if any.
+def _buildFingerprint(argList, postProcess=None):
+    return json.dumps({
+        'command': argList[1:-3],
+        'pyqt5': PYQT_VERSION_STR,
+        'pyqt5ac': __version__,
+        'postProcess': postProcess.__name__ if postProcess is not None else None,
+    }, sort_keys=True)
+
+
+def _readFingerprint(filename):
+    # The fingerprint is stored in a comment on the last line of the generated file, see _replaceDestination
+    # Only the end of the file is read since generated resource files can be large
+    try:
+        with open(filename, 'rb') as fh:
+            fh.seek(0, os.SEEK_END)
+            fh.seek(max(0, fh.tell() - _fingerprintMaxSize))
+            lastLine = fh.read().rstrip().rsplit(b'\n', 1)[-1].decode('utf-8', errors='replace').strip()
+    except FileNotFoundError:
+        return None
+
+    if lastLine.startswith(_fingerprintPrefix):
+        return lastLine[len(_fingerprintPrefix):]
+
+    return None
+
+
+# If a fingerprint is given, the destination file is also outdated when it was generated with a different fingerprint
+# Destination files without a recorded fingerprint (e.g. generated by an older version of pyqt5ac) are outdated too so
+# that they are compiled once with the current options
+def _isOutdated(src, dst, isQRCFile, fingerprint=None):
     outdated = (not os.path.exists(dst) or
                 (os.path.getmtime(src) > os.path.getmtime(dst)))
 
+    if not outdated and fingerprint is not None:
+        outdated = _readFingerprint(dst) != fingerprint
+
     if not outdated and isQRCFile:
         # For qrc files, we need to check each individual resources.
         # If one of them is newer than the dst file, the qrc file must be considered as outdated.
@@ -64,6 +146,387 @@ def _isOutdated(src, dst, isQRCFile):
     return outdated
 
 
+def _getModificationTime(filename):
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        return None
+
+
+# Return the lock file used for all of the generated files in the given output directory
+# Lock files are placed in the temporary directory rather than the output directory so that they do not end up in the
+# generated package. The name is derived from the absolute path of the output directory.
+def _getLockFilename(destDirectory):
+    destDirectory = os.path.normcase(os.path.abspath(destDirectory))
+    return os.path.join(tempfile.gettempdir(),
+                        'pyqt5ac-%s.lock' % hashlib.sha1(destDirectory.encode('utf-8')).hexdigest())
+
+
+# Open the given lock file, creating it if necessary, and return its file descriptor
+# The lock files are shared between all users of the temporary directory, so they are made writable by everyone.
+# Existing files are opened without O_CREAT since fs.protected_regular forbids that for files of other users in
+# sticky directories such as /tmp.
+def _openLockFile(lockFilename):
+    try:
+        return os.open(lockFilename, os.O_RDWR)
+    except FileNotFoundError:
+        pass
+
+    fd = os.open(lockFilename, os.O_RDWR | os.O_CREAT, 0o666)
+
+    # The mode given to os.open is restricted by the umask, so set it explicitly afterwards
+    if hasattr(os, 'fchmod'):
+        try:
+            os.fchmod(fd, 0o666)
+        except OSError:
+            pass
+
+    return fd
+
+
+# Acquire an exclusive advisory lock on the given lock file, blocking until it is available
+# Multiple processes (e.g. pytest-xdist workers or several application instances) may run pyqt5ac on the same tree at
+# the same time. The lock guarantees only one of them compiles a target while the others wait for it to finish.
+# The lock file itself is left behind on purpose, removing it would allow two processes to lock different files.
+# If the lock file cannot be opened (e.g. it belongs to another user), a warning is shown and the files are compiled
+# without the lock rather than failing.
+@contextlib.contextmanager
+def _lockFile(lockFilename):
+    try:
+        fd = _openLockFile(lockFilename)
+    except OSError as e:
+        click.secho('Unable to open lock file %s, compiling without lock: %s' % (lockFilename, e), fg='yellow')
+        yield
+        return
+
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # msvcrt.locking gives up after roughly 10 seconds with an OSError, so keep trying until it succeeds
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+# Rewrite a module generated by pyuic5 so that it is faster to set up
+# All translatable strings in retranslateUi are collected into a module-level table and translated with a single list
+# comprehension. Identical strings are only translated once. setEnabled(True) calls on widgets created from stock Qt
+# classes are removed as well.
+# If the code does not look like it was generated by pyuic5, it is returned unchanged.
+def _optimizeUiModule(originalCode):
+    stockWidgets = set(_stockWidgetRegex.findall(originalCode))
+    code = _redundantSetterRegex.sub(lambda match: '' if match.group(1) in stockWidgets else match.group(0),
+                                     originalCode)
+
+    translations = []
+    translationIndices = {}
+
+    def replaceTranslateCall(match):
+        args = match.group(1)
+
+        if args not in translationIndices:
+            translationIndices[args] = len(translations)
+            translations.append(args)
+
+        return '_t[%i]' % translationIndices[args]
+
+    code = _translateCallRegex.sub(replaceTranslateCall, code)
+
+    if not translations:
+        return code
+
+    # Translate the whole table right after the translate function is retrieved in retranslateUi
+    # Without this line, the _t[i] references above would fail with a NameError, so leave the code untouched instead
+    code, count = re.subn(r'^([ \t]*)(_translate = QtCore\.QCoreApplication\.translate\n)',
+                          r'\1\2\1_t = [_translate(*args) for args in _TRANSLATIONS]\n', code, count=1, flags=re.M)
+
+    if not count:
+        return originalCode
+
+    # Place the table right before the generated class
+    table = '_TRANSLATIONS = (\n%s)\n\n\n' % ''.join('    (%s),\n' % args for args in translations)
+    code, count = re.subn(r'^(class Ui_)', lambda match: table + match.group(1), code, count=1, flags=re.M)
+
+    if not count:
+        return originalCode
+
+    return code
+
+
+def _getTempFilename(destFilename):
+    # The compiler creates the file itself so it gets the usual permissions, the process ID keeps the name unique
+    return '%s.%i.tmp' % (destFilename, os.getpid())
+
+
+# Move a successfully compiled temporary file into place
+# os.replace is atomic, so other processes importing the destination file never see a partially written file.
+# If given, postProcess is called with the generated code and returns the code to write to the destination instead.
+# If given, the fingerprint is appended to the generated file as a comment so that _isOutdated can check it later.
+def _replaceDestination(tempFilename, destFilename, postProcess=None, fingerprint=None):
+    if postProcess is not None:
+        with open(tempFilename, 'r', encoding='utf-8') as fh:
+            code = fh.read()
+
+        with open(tempFilename, 'w', encoding='utf-8') as fh:
+            fh.write(postProcess(code))
+
+    if fingerprint is not None:
+        # Opened with r+ rather than a so that a missing file is an error rather than being created
+        with open(tempFilename, 'r+', encoding='utf-8') as fh:
+            fh.seek(0, os.SEEK_END)
+            fh.write('\n%s%s\n' % (_fingerprintPrefix, fingerprint))
+
+    os.replace(tempFilename, destFilename)
+
+
+# Run the compiler into a temporary file next to the destination and then move it into place
+# If the compiler fails, the temporary file is removed and the previous destination file, if any, is left untouched.
+def _compile(module, command, options, sourceFilename, destFilename, postProcess=None, fingerprint=None):
+    tempFilename = _getTempFilename(destFilename)
+
+    argList, commandString = _buildCommand(module, command, options, sourceFilename, tempFilename)
+
+    # Show the real destination filename to the user rather than the temporary one
+    commandString = commandString.replace(shlex.quote(tempFilename), shlex.quote(destFilename))
+
+    try:
+        commandResult = subprocess.run(argList, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # An error while moving the file into place is reported for this file only, just like in _compileBatched
+        try:
+            if commandResult.returncode == 0:
+                _replaceDestination(tempFilename, destFilename, postProcess, fingerprint)
+        except Exception:
+            commandResult = subprocess.CompletedProcess(argList, 1, commandResult.stdout,
+                                                        traceback.format_exc().encode())
+    finally:
+        if os.path.exists(tempFilename):
+            os.remove(tempFilename)
+
+    return commandResult, commandString
+
+
+# Split the jobs into batches, one per worker process
+# The number of workers grows with the number of jobs, up to the number of CPUs, with at least _minBatchSize jobs each
+def _splitBatches(jobs):
+    workerCount = max(1, min(os.cpu_count() or 1, len(jobs) // _minBatchSize))
+    batchSize = math.ceil(len(jobs) / workerCount)
+
+    return [jobs[i:i + batchSize] for i in range(0, len(jobs), batchSize)]
+
+
+# Compile many files using a few worker processes rather than one process per file
+# This amortizes the cost of starting the interpreter and importing PyQt5 over all of the files in a batch. Each
+# worker receives its jobs as JSON over stdin and writes one JSON result per job to stdout, see _batchWorker.
+# Returns a list with the command result and command string of each job, in the same order as the jobs.
+def _compileBatched(jobs):
+    workers = []
+
+    for batch in _splitBatches(jobs):
+        payload = []
+        commandStrings = []
+
+        for job in batch:
+            tempFilename = _getTempFilename(job.destFilename)
+            argList, commandString = _buildCommand(job.module, job.command, job.options, job.sourceFilename,
+                                                   tempFilename)
+
+            # The worker runs the module itself, so only the arguments after 'python -m XXX' are sent to it
+            payload.append({'module': argList[2], 'args': argList[3:]})
+            commandStrings.append(commandString.replace(shlex.quote(tempFilename), shlex.quote(job.destFilename)))
+
+        # Start all of the workers before reading any results so that they run in parallel
+        process = subprocess.Popen([sys.executable, os.path.abspath(__file__), _batchWorkerArgument],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        workers.append((process, json.dumps(payload).encode(), batch, commandStrings))
+
+    # Each worker is collected with communicate in its own thread, so that a worker filling up one of its pipes never
+    # blocks the others, and a worker that exits before reading its jobs does not raise a BrokenPipeError
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(workers)) as executor:
+        outputs = list(executor.map(lambda worker: worker[0].communicate(worker[1]), workers))
+
+    results = []
+
+    for (process, payload, batch, commandStrings), (stdout, stderr) in zip(workers, outputs):
+        workerResults = _parseWorkerResults(stdout)
+
+        for i, (job, commandString) in enumerate(zip(batch, commandStrings)):
+            if i < len(workerResults):
+                result = workerResults[i]
+                commandResult = subprocess.CompletedProcess(commandString, result['returncode'],
+                                                            result['stdout'].encode(), result['stderr'].encode())
+            else:
+                # The worker stopped before reaching this job, report the worker's own error for it instead
+                commandResult = subprocess.CompletedProcess(commandString, process.returncode or 1, b'', stderr)
+
+            tempFilename = _getTempFilename(job.destFilename)
+
+            # An error while moving one file into place is reported for that file only, the remaining files are still
+            # handled and their temporary files removed
+            try:
+                if commandResult.returncode == 0:
+                    _replaceDestination(tempFilename, job.destFilename, job.postProcess, job.fingerprint)
+            except Exception:
+                commandResult = subprocess.CompletedProcess(commandString, 1, commandResult.stdout,
+                                                            traceback.format_exc().encode())
+            finally:
+                if os.path.exists(tempFilename):
+                    os.remove(tempFilename)
+
+            results.append((commandResult, commandString))
+
+    return results
+
+
+# Parse the results written by a worker, one JSON object per line
+# A worker that crashed while writing a result may leave a partial last line, which is ignored so the job is reported
+# as failed together with the remaining jobs of the worker
+def _parseWorkerResults(stdout):
+    results = []
+
+    for line in stdout.decode('utf-8', errors='replace').splitlines():
+        try:
+            results.append(json.loads(line))
+        except ValueError:
+            break
+
+    return results
+
+
+# Run a compiler module like 'python -m XXX' would, but within this process, and return its exit status
+def _runModule(module, args):
+    sys.argv = [module] + args
+
+    try:
+        runpy.run_module(module, run_name='__main__', alter_sys=True)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+
+        sys.stderr.write('%s\n' % e.code)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+    return 0
+
+
+# Entry point of the worker processes started by _compileBatched
+# The output of each compiler is captured at the file descriptor level, which also catches output from Qt itself, and
+# is returned with the result of the job. The original stdout is reserved for the results.
+def _batchWorker():
+    jobs = json.load(sys.stdin)
+
+    with os.fdopen(os.dup(sys.stdout.fileno()), 'w') as resultFile:
+        for job in jobs:
+            with tempfile.TemporaryFile() as stdoutFile, tempfile.TemporaryFile() as stderrFile:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                savedStdout, savedStderr = os.dup(1), os.dup(2)
+                os.dup2(stdoutFile.fileno(), 1)
+                os.dup2(stderrFile.fileno(), 2)
+
+                try:
+                    returncode = _runModule(job['module'], job['args'])
+                finally:
+                    sys.stdout.flush()
+                    sys.stderr.flush()
+                    os.dup2(savedStdout, 1)
+                    os.dup2(savedStderr, 2)
+                    os.close(savedStdout)
+                    os.close(savedStderr)
+
+                stdoutFile.seek(0)
+                stderrFile.seek(0)
+                result = {
+                    'returncode': returncode,
+                    'stdout': stdoutFile.read().decode(errors='replace'),
+                    'stderr': stderrFile.read().decode(errors='replace'),
+                }
+
+            # Results are written as they complete so that a crash only affects the remaining jobs
+            resultFile.write(json.dumps(result) + '\n')
+            resultFile.flush()
+
+
+# Check whether a job still needs to be compiled, must be called while holding the lock of its output directory
+def _needsCompile(job, force):
+    # If the destination changed since the job was created, another process just compiled this target. The result can
+    # be reused as-is, even when force compiling, but only if it was compiled with the same options
+    if (_getModificationTime(job.destFilename) != job.destModTime and
+            _readFingerprint(job.destFilename) == job.fingerprint):
+        click.secho('Skipping %s, compiled by another process' % job.filename)
+        return False
+
+    # If we are force compiling everything or the source file is outdated, then compile, otherwise skip!
+    if not force and not _isOutdated(job.sourceFilename, job.destFilename, job.isQRCFile, job.fingerprint):
+        click.secho('Skipping %s, up to date' % job.filename)
+        return False
+
+    return True
+
+
+def _reportResult(commandResult, commandString):
+    if commandResult.returncode == 0:
+        click.secho(commandString, fg='green')
+    else:
+        if commandResult.stderr:
+            click.secho(commandString, fg='yellow')
+            click.secho(commandResult.stderr.decode(), fg='red')
+        else:
+            click.secho(commandString, fg='yellow')
+            click.secho('Command returned with non-zero exit status %i' % commandResult.returncode,
+                        fg='red')
+
+
+def _runJob(job, force):
+    with _lockFile(_getLockFilename(os.path.dirname(job.destFilename))):
+        if not _needsCompile(job, force):
+            return
+
+        commandResult, commandString = _compile(job.module, job.command, job.options, job.sourceFilename,
+                                                job.destFilename, job.postProcess, job.fingerprint)
+
+    _reportResult(commandResult, commandString)
+
+
+def _runJobsBatched(jobs, force):
+    # Only one job per destination file, the last one wins just like when compiling the files one by one
+    jobs = list({job.destFilename: job for job in jobs}.values())
+
+    with contextlib.ExitStack() as stack:
+        # Locks are always acquired in the same order to avoid deadlocks between processes
+        for lockFilename in sorted({_getLockFilename(os.path.dirname(job.destFilename)) for job in jobs}):
+            stack.enter_context(_lockFile(lockFilename))
+
+        jobs = [job for job in jobs if _needsCompile(job, force)]
+
+        if not jobs:
+            return
+
+        results = _compileBatched(jobs)
+
+    for commandResult, commandString in results:
+        _reportResult(commandResult, commandString)
+
+
 @click.command(name='pyqt5ac')
 @click.option('--rcc_options', 'rccOptions', default='',
               help='Additional options to pass to resource compiler [default: none]')
@@ -75,9 +538,13 @@ def _isOutdated(src, dst, isQRCFile):
 @click.option('--init-package', 'initPackage', default=True, is_flag=True,
               help='Ensures that the folder containing the generated files is a Python subpackage '
                    '(i.e. it contains a file called __init__.py')
+@click.option('--optimize-ui', 'optimizeUi', default=False, is_flag=True,
+              help='Rewrite the generated UI modules so they are faster to set up')
+@click.option('--batch', default=False, is_flag=True,
+              help='Compile the files using a few worker processes rather than one process per file')
 @click.argument('iopaths', nargs=-1, required=False)
 @click.version_option(__version__)
-def cli(rccOptions, uicOptions, force, config, iopaths=(), initPackage=True):
+def cli(rccOptions, uicOptions, force, config, iopaths=(), initPackage=True, optimizeUi=False, batch=False):
     """Compile PyQt5 UI/QRC files into Python
 
     IOPATHS argument is a space delineated pair of glob expressions that specify the source files to compile as the
@@ -92,7 +559,8 @@ def cli(rccOptions, uicOptions, force, config, iopaths=(), initPackage=True):
         * %%DIRNAME%% - Directory of the source file
 
     Files that match a given source path expression are compiled if and only if the file has been modified since the
-    last compilation unless the FORCE flag is set. If the destination file does not exist, then the file is compiled.
+    last compilation, or the compiler options or PyQt5 version used have changed, unless the FORCE flag is set. If the
+    destination file does not exist, then the file is compiled.
 
     A JSON or YAML configuration file path can be specified using the config option. See the GitHub page for example
     config files.
@@ -126,7 +594,7 @@ def cli(rccOptions, uicOptions, force, config, iopaths=(), initPackage=True):
     ioPaths = list(zip(iopaths[::2], iopaths[1::2]))
 
     main(rccOptions=rccOptions, uicOptions=uicOptions, force=force, config=config, ioPaths=ioPaths,
-         initPackage=initPackage)
+         initPackage=initPackage, optimizeUi=optimizeUi, batch=batch)
 
 
 def replaceVariables(variables_definition, string_with_variables):
@@ -161,7 +629,8 @@ def resolvePath(path: str, reference_path: str) -> str:
     return path
 
 
-def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), variables=None, initPackage=True):
+def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), variables=None, initPackage=True,
+         optimizeUi=False, batch=False):
     if config:
         with open(config, 'r') as fh:
             if config.endswith('.yml'):
@@ -181,6 +650,8 @@ def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), varia
             ioPaths = configData.get('ioPaths', ioPaths)
             variables = configData.get('variables', variables)
             initPackage = configData.get('init_package', initPackage)
+            optimizeUi = configData.get('optimize_ui', optimizeUi)
+            batch = configData.get('batch', batch)
 
     # Validate the custom variables
     if variables is None:
@@ -188,6 +659,9 @@ def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), varia
     if 'FILENAME' in variables.keys() or 'EXT' in variables.keys() or 'DIRNAME' in variables.keys():
         raise ValueError("Custom variables cannot be called FILENAME, EXT or DIRNAME.")
 
+    # Files to compile in batch mode, these are compiled once all of the io paths have been searched
+    jobs = []
+
     # Loop through the list of io paths
     for sourceFileExpr, destFileExpr in ioPaths:
         foundItem = False
@@ -230,11 +704,13 @@ def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), varia
                 module = 'PyQt5.uic.pyuic'
                 command = 'pyuic5'
                 options = uicOptions
+                postProcess = _optimizeUiModule if optimizeUi else None
             elif ext == '.qrc':
                 isQRCFile = True
                 module = 'PyQt5.pyrcc_main'
                 command = 'pyrcc5'
                 options = rccOptions
+                postProcess = None
             else:
                 click.secho('Unknown target %s found' % sourceFilename, fg='yellow')
                 continue
@@ -248,28 +724,26 @@ def main(rccOptions='', uicOptions='', force=False, config='', ioPaths=(), varia
                 with open(os.path.join(dest_file_directory, "__init__.py"), 'a'):
                     pass
 
-            # If we are force compiling everything or the source file is outdated, then compile, otherwise skip!
-            if force or _isOutdated(sourceFilename, destFilename, isQRCFile):
-                argList, commandString = _buildCommand(module, command, options, sourceFilename, destFilename)
+            argList, _ = _buildCommand(module, command, options, sourceFilename, destFilename)
 
-                commandResult = subprocess.run(argList, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            # Remember the destination modification time before waiting on the lock, see _needsCompile
+            job = _Job(filename, module, command, options, sourceFilename, destFilename, isQRCFile, postProcess,
+                       _buildFingerprint(argList, postProcess), _getModificationTime(destFilename))
 
-                if commandResult.returncode == 0:
-                    click.secho(commandString, fg='green')
-                else:
-                    if commandResult.stderr:
-                        click.secho(commandString, fg='yellow')
-                        click.secho(commandResult.stderr.decode(), fg='red')
-                    else:
-                        click.secho(commandString, fg='yellow')
-                        click.secho('Command returned with non-zero exit status %i' % commandResult.returncode,
-                                    fg='red')
+            if batch:
+                jobs.append(job)
             else:
-                click.secho('Skipping %s, up to date' % filename)
+                _runJob(job, force)
 
         if not foundItem:
             click.secho('No items found in %s' % sourceFileExpr)
 
+    if jobs:
+        _runJobsBatched(jobs, force)
+
 
 if __name__ == '__main__':
-    cli()
+    if sys.argv[1:] == [_batchWorkerArgument]:
+        _batchWorker()
+    else:
+        cli()
@@ -1,4 +1,6 @@
+import importlib.util
 import os
+import threading
 import time
 
 import pytest
@@ -77,6 +79,54 @@ def _write_ui_file(file):
     """)
 
 
+def _write_translated_ui_file(file):
+    file.write("""<?xml version="1.0" encoding="UTF-8"?>
+    <ui version="4.0">
+     <class>MainWidget</class>
+     <widget class="QWidget" name="MainWidget">
+      <property name="windowTitle">
+       <string>Main "window"</string>
+      </property>
+      <layout class="QVBoxLayout" name="layout">
+       <item>
+        <widget class="QLabel" name="label">
+         <property name="enabled">
+          <bool>true</bool>
+         </property>
+         <property name="text">
+          <string>Name</string>
+         </property>
+         <property name="toolTip">
+          <string>Name</string>
+         </property>
+        </widget>
+       </item>
+       <item>
+        <widget class="QPushButton" name="button">
+         <property name="text">
+          <string comment="button">Name</string>
+         </property>
+        </widget>
+       </item>
+      </layout>
+     </widget>
+    </ui>
+    """)
+
+
+def _load_module(file):
+    spec = importlib.util.spec_from_file_location(file.purebasename, str(file))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _write_up_to_date_file(file, module="PyQt5.uic.pyuic", options=""):
+    # Generated file with the fingerprint pyqt5ac records when compiling with the given options
+    arg_list, _ = pyqt5ac._buildCommand(module, "", options, "", str(file))
+    file.write("test\n%s%s\n" % (pyqt5ac._fingerprintPrefix, pyqt5ac._buildFingerprint(arg_list)))
+
+
 def _write_resource_file(file):
     file.write("""<!DOCTYPE RCC><RCC version="1.0">
     <qresource>
@@ -130,7 +180,8 @@ def test_ui_generation_when_up_to_date(tmpdir):
     _write_ui_file(ui_file)
 
     dest_file = tmpdir.mkdir("generated").join("main_ui.py")
-    dest_file.write("test")
+    _write_up_to_date_file(dest_file)
+    contents = dest_file.read()
     modification_time = dest_file.mtime()
 
     pyqt5ac.main(config=str(config))
@@ -140,7 +191,23 @@ def test_ui_generation_when_up_to_date(tmpdir):
     dest_file = tmpdir.join("generated/main_ui.py")
     _assert_path_exists(dest_file)
     assert modification_time == dest_file.mtime()
-    assert "test" == dest_file.read()
+    assert contents == dest_file.read()
+
+
+def test_ui_generation_when_fingerprint_missing(tmpdir):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+
+    # Files generated by older versions of pyqt5ac have no fingerprint and are compiled once more
+    _wait()
+    dest_file = tmpdir.mkdir("generated").join("main_ui.py")
+    dest_file.write("test")
+
+    pyqt5ac.main(config=str(config))
+
+    assert "test" != dest_file.read()
+    assert dest_file.read().rstrip().splitlines()[-1].startswith(pyqt5ac._fingerprintPrefix)
 
 
 def test_ui_generation_when_out_of_date(tmpdir):
@@ -266,8 +333,23 @@ def test_ui_generation_when_invalid(tmpdir):
 
     assert tmpdir.join("generated").check()
     _assert_empty_file_exists(tmpdir.join("generated/__init__.py"))
-    # TODO generated file should not exist and pyqt5ac should fail
-    assert tmpdir.join("generated/main_ui.py").check()
+    # Output is written atomically so a failed compilation leaves no partial file behind
+    _assert_path_does_not_exist(tmpdir.join("generated/main_ui.py"))
+
+
+def test_ui_generation_when_invalid_keeps_previous_output(tmpdir):
+    config = _write_config_file(tmpdir)
+    dest_file = tmpdir.mkdir("generated").join("main_ui.py")
+    dest_file.write("test")
+
+    _wait()
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    ui_file.write("invalid_content")
+
+    pyqt5ac.main(config=str(config))
+
+    assert "test" == dest_file.read()
+    assert [] == tmpdir.join("generated").listdir("*.tmp")
 
 
 def test_ui_generation_with_variables(tmpdir):
@@ -373,3 +455,346 @@ def test_config_file_path_is_relative_to_cwd(tmpdir):
         pyqt5ac.main(config="input_config.yml")
 
 
+def test_concurrent_generation_compiles_once(tmpdir, monkeypatch):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+
+    compiled = []
+    original_compile = pyqt5ac._compile
+
+    def _counting_compile(*args):
+        compiled.append(args)
+        return original_compile(*args)
+
+    monkeypatch.setattr(pyqt5ac, "_compile", _counting_compile)
+
+    threads = [threading.Thread(target=pyqt5ac.main, kwargs={"config": str(config)}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert 1 == len(compiled)
+    _assert_path_exists(tmpdir.join("generated/main_ui.py"))
+
+
+def test_generation_when_lock_file_cannot_be_opened(tmpdir, monkeypatch):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+
+    def _open_lock_file(lock_filename):
+        raise PermissionError("Permission denied: " + lock_filename)
+
+    monkeypatch.setattr(pyqt5ac, "_openLockFile", _open_lock_file)
+
+    pyqt5ac.main(config=str(config))
+
+    _assert_path_exists(tmpdir.join("generated/main_ui.py"))
+
+
+def test_lock_file_is_writable_by_everyone(tmpdir):
+    lock_file = tmpdir.join("test.lock")
+
+    with pyqt5ac._lockFile(str(lock_file)):
+        pass
+
+    if os.name == "posix":
+        assert 0o666 == lock_file.stat().mode & 0o777
+
+
+def test_ui_generation_with_optimization(tmpdir):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_translated_ui_file(ui_file)
+
+    pyqt5ac.main(config=str(config), optimizeUi=True)
+
+    dest_file = tmpdir.join("generated/main_ui.py")
+    _assert_path_exists(dest_file)
+    code = dest_file.read()
+    assert "_TRANSLATIONS = (" in code
+    assert "_translate(\"" not in code
+    assert "setEnabled(True)" not in code
+    # Identical strings are only translated once
+    assert 1 == code.count('("MainWidget", "Name"),')
+    assert 1 == code.count('("MainWidget", "Name", "button"),')
+
+
+def test_ui_generation_with_optimization_keeps_promoted_widgets_enabled(tmpdir, monkeypatch):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+
+    # Promoted widget whose constructor disables it, the .ui file enables it again
+    tmpdir.mkdir("widgets").join("guarded.py").write("""from PyQt5 import QtWidgets
+
+
+class Guarded(QtWidgets.QLineEdit):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setEnabled(False)
+""")
+    monkeypatch.syspath_prepend(str(tmpdir.join("widgets")))
+
+    tmpdir.mkdir("gui").join("main.ui").write("""<?xml version="1.0" encoding="UTF-8"?>
+    <ui version="4.0">
+     <class>MainWidget</class>
+     <widget class="QWidget" name="MainWidget">
+      <layout class="QVBoxLayout" name="layout">
+       <item>
+        <widget class="Guarded" name="guarded">
+         <property name="enabled">
+          <bool>true</bool>
+         </property>
+        </widget>
+       </item>
+       <item>
+        <widget class="QLineEdit" name="lineEdit">
+         <property name="enabled">
+          <bool>true</bool>
+         </property>
+        </widget>
+       </item>
+      </layout>
+     </widget>
+     <customwidgets>
+      <customwidget>
+       <class>Guarded</class>
+       <extends>QLineEdit</extends>
+       <header>guarded.h</header>
+      </customwidget>
+     </customwidgets>
+    </ui>
+    """)
+
+    pyqt5ac.main(ioPaths=[[str(tmpdir.join("gui/*.ui")), str(tmpdir.join("optimized/%%FILENAME%%_ui.py"))]],
+                 optimizeUi=True)
+
+    code = tmpdir.join("optimized/main_ui.py").read()
+    assert "self.guarded.setEnabled(True)" in code
+    assert "self.lineEdit.setEnabled(True)" not in code
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+    widget = QtWidgets.QWidget()
+    ui = _load_module(tmpdir.join("optimized/main_ui.py")).Ui_MainWidget()
+    ui.setupUi(widget)
+
+    assert ui.guarded.isEnabled()
+    assert ui.lineEdit.isEnabled()
+
+
+def test_optimization_leaves_unrecognized_code_untouched():
+    # Without the _translate assignment, rewriting the calls would result in a NameError when the module is used
+    code = """class Ui_MainWidget(object):
+    def retranslateUi(self, MainWidget):
+        MainWidget.setWindowTitle(_translate("MainWidget", "Title"))
+"""
+
+    assert code == pyqt5ac._optimizeUiModule(code)
+
+
+def test_ui_generation_with_optimization_matches_unoptimized(tmpdir, monkeypatch):
+    monkeypatch.setenv("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5 import QtWidgets
+
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_translated_ui_file(ui_file)
+
+    pyqt5ac.main(ioPaths=[[str(tmpdir.join("gui/*.ui")), str(tmpdir.join("plain/%%FILENAME%%_ui.py"))]])
+    pyqt5ac.main(ioPaths=[[str(tmpdir.join("gui/*.ui")), str(tmpdir.join("optimized/%%FILENAME%%_ui.py"))]],
+                 optimizeUi=True)
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])  # noqa: F841
+    widgets = []
+    for name in ("plain", "optimized"):
+        module = _load_module(tmpdir.join(name, "main_ui.py"))
+        widget = QtWidgets.QWidget()
+        ui = module.Ui_MainWidget()
+        ui.setupUi(widget)
+        widgets.append((widget, ui))
+
+    (plain_widget, plain), (optimized_widget, optimized) = widgets
+    assert plain_widget.windowTitle() == optimized_widget.windowTitle()
+    assert plain.label.isEnabled() == optimized.label.isEnabled()
+    assert plain.label.text() == optimized.label.text()
+    assert plain.label.toolTip() == optimized.label.toolTip()
+    assert plain.button.text() == optimized.button.text()
+
+
+def test_generation_when_options_changed(tmpdir):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+    resource_file = tmpdir.mkdir("resources").join("resource.qrc")
+    _write_resource_file(resource_file)
+    tmpdir.join("resources/example.png").write("test")
+
+    pyqt5ac.main(config=str(config))
+
+    ui_dest_file = tmpdir.join("generated/main_ui.py")
+    resource_dest_file = tmpdir.join("generated/resource_rc.py")
+    ui_mod_time = ui_dest_file.mtime()
+    resource_mod_time = resource_dest_file.mtime()
+
+    # Same options, nothing is compiled
+    _wait()
+    pyqt5ac.main(config=str(config))
+
+    assert ui_mod_time == ui_dest_file.mtime()
+    assert resource_mod_time == resource_dest_file.mtime()
+
+    # Changing the UI compiler options only recompiles the UI files
+    pyqt5ac.main(config=str(config), uicOptions="--from-imports")
+
+    assert ui_mod_time != ui_dest_file.mtime()
+    assert "--from-imports" in ui_dest_file.read()
+    assert resource_mod_time == resource_dest_file.mtime()
+
+
+def test_output_compiled_concurrently_with_other_options(tmpdir):
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+    dest_file = tmpdir.mkdir("generated").join("main_ui.py")
+
+    arg_list, _ = pyqt5ac._buildCommand("PyQt5.uic.pyuic", "pyuic5", "", str(ui_file), str(dest_file))
+    job = pyqt5ac._Job("main", "PyQt5.uic.pyuic", "pyuic5", "", str(ui_file), str(dest_file), False, None,
+                       pyqt5ac._buildFingerprint(arg_list), None)
+
+    # Another process compiled the file with different options while this job was waiting for the lock
+    _write_up_to_date_file(dest_file, options="--from-imports")
+    assert pyqt5ac._needsCompile(job, force=False)
+
+    # With the same options, its result is reused
+    _write_up_to_date_file(dest_file)
+    assert not pyqt5ac._needsCompile(job, force=True)
+
+
+def test_generation_when_optimization_changed(tmpdir):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_translated_ui_file(ui_file)
+
+    pyqt5ac.main(config=str(config))
+
+    dest_file = tmpdir.join("generated/main_ui.py")
+    assert "_TRANSLATIONS" not in dest_file.read()
+
+    pyqt5ac.main(config=str(config), optimizeUi=True)
+
+    assert "_TRANSLATIONS" in dest_file.read()
+
+
+def test_batch_generation(tmpdir):
+    config = _write_config_file(tmpdir)
+    tmpdir.mkdir("gui")
+    for i in range(20):
+        _write_ui_file(tmpdir.join("gui/main%i.ui" % i))
+    tmpdir.join("gui/invalid.ui").write("invalid_content")
+    resource_file = tmpdir.mkdir("resources").join("resource.qrc")
+    _write_resource_file(resource_file)
+    tmpdir.join("resources/example.png").write("test")
+
+    pyqt5ac.main(config=str(config), batch=True, optimizeUi=True)
+
+    for i in range(20):
+        _assert_path_exists(tmpdir.join("generated/main%i_ui.py" % i))
+    _assert_path_exists(tmpdir.join("generated/resource_rc.py"))
+    # Failures are reported per file and do not affect the other files in the batch
+    _assert_path_does_not_exist(tmpdir.join("generated/invalid_ui.py"))
+    assert [] == tmpdir.join("generated").listdir("*.tmp")
+
+
+def test_batch_generation_matches_unbatched(tmpdir):
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_translated_ui_file(ui_file)
+
+    pyqt5ac.main(ioPaths=[[str(tmpdir.join("gui/*.ui")), str(tmpdir.join("plain/%%FILENAME%%_ui.py"))]],
+                 uicOptions="--from-imports")
+    pyqt5ac.main(ioPaths=[[str(tmpdir.join("gui/*.ui")), str(tmpdir.join("batched/%%FILENAME%%_ui.py"))]],
+                 uicOptions="--from-imports", batch=True)
+
+    # Includes the fingerprint at the end of the file
+    assert tmpdir.join("plain/main_ui.py").read() == tmpdir.join("batched/main_ui.py").read()
+
+
+def test_batch_generation_when_up_to_date(tmpdir):
+    config = _write_config_file(tmpdir)
+    ui_file = tmpdir.mkdir("gui").join("main.ui")
+    _write_ui_file(ui_file)
+
+    dest_file = tmpdir.mkdir("generated").join("main_ui.py")
+    _write_up_to_date_file(dest_file)
+    contents = dest_file.read()
+
+    pyqt5ac.main(config=str(config), batch=True)
+
+    assert contents == dest_file.read()
+
+
+def test_batch_generation_when_worker_crashes(tmpdir, monkeypatch):
+    config = _write_config_file(tmpdir)
+    tmpdir.mkdir("gui")
+    for i in range(3):
+        _write_ui_file(tmpdir.join("gui/main%i.ui" % i))
+
+    # Worker that exits without reading its jobs, writes more than a pipe buffer to stderr and leaves a partial result
+    worker = tmpdir.join("worker.py")
+    worker.write("""import sys
+sys.stdout.write('{"returncode": 0, "stdout": "", "stderr": ""}\\n{"returncode"')
+sys.stderr.write('x' * 100000)
+sys.exit(1)
+""")
+    monkeypatch.setattr(pyqt5ac, "__file__", str(worker))
+
+    pyqt5ac.main(config=str(config), batch=True)
+
+    # Only the first job has a result, but the worker never compiled anything so its file does not exist either
+    for i in range(3):
+        _assert_path_does_not_exist(tmpdir.join("generated/main%i_ui.py" % i))
+    assert [] == tmpdir.join("generated").listdir("*.tmp")
+
+
+def test_batch_generation_when_post_processing_fails(tmpdir, monkeypatch):
+    config = _write_config_file(tmpdir)
+    tmpdir.mkdir("gui")
+    _write_ui_file(tmpdir.join("gui/main0.ui"))
+    _write_translated_ui_file(tmpdir.join("gui/main1.ui"))
+
+    def _failing_optimize(code):
+        if "_translate(" in code:
+            raise RuntimeError("post-processing failed")
+        return code
+
+    monkeypatch.setattr(pyqt5ac, "_optimizeUiModule", _failing_optimize)
+
+    pyqt5ac.main(config=str(config), batch=True, optimizeUi=True)
+
+    _assert_path_exists(tmpdir.join("generated/main0_ui.py"))
+    _assert_path_does_not_exist(tmpdir.join("generated/main1_ui.py"))
+    assert [] == tmpdir.join("generated").listdir("*.tmp")
+
+
+def test_generation_when_post_processing_fails(tmpdir, monkeypatch):
+    config = _write_config_file(tmpdir)
+    tmpdir.mkdir("gui")
+    for i in range(3):
+        _write_ui_file(tmpdir.join("gui/main%i.ui" % i))
+
+    calls = []
+
+    def _failing_optimize(code):
+        calls.append(code)
+        if len(calls) == 1:
+            raise RuntimeError("post-processing failed")
+        return code
+
+    monkeypatch.setattr(pyqt5ac, "_optimizeUiModule", _failing_optimize)
+
+    # The first file fails, the remaining files are still compiled
+    pyqt5ac.main(config=str(config), optimizeUi=True)
+
+    assert 3 == len(calls)
+    generated = [tmpdir.join("generated/main%i_ui.py" % i).check() for i in range(3)]
+    assert 2 == generated.count(True)
+    assert [] == tmpdir.join("generated").listdir("*.tmp")